@@ -1,150 +1,406 @@
 import asyncio
-import re
+import atexit
 import os
+import re
+import threading
+from collections import OrderedDict
+from hashlib import sha1
+from typing import AsyncIterator, Optional
+from anyio.from_thread import BlockingPortal, start_blocking_portal
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from services.ai_service import AIService
+from .orm_validator import validate_orm
+
+_MODEL = os.getenv("AI_MODEL")
+if not _MODEL:
+    raise RuntimeError("AI_MODEL environment variable is not set")
+
+_TOKENIZER = None
+if os.getenv("AI_PROMPT_TOKEN_IDS") == "1":
+    from transformers import AutoTokenizer
+
+    _TOKENIZER = AutoTokenizer.from_pretrained(_MODEL)
+
+_AI_SERVICE = AIService(model_name=_MODEL, tokenizer=_TOKENIZER)
+
+_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+# Shared by every AI call in the process so concurrent requests stay under the limit.
+_AI_SEMAPHORE = asyncio.Semaphore(_MAX_CONCURRENCY)
+
+# Event loop thread shared by all sync calls; the AI and Redis clients' pools are bound to it.
+_PORTAL: Optional[BlockingPortal] = None
+_PORTAL_LOCK = threading.Lock()
+
+_NUMBERING_RE = re.compile(r"^\s*\d+[.)]\s*")
+# Longest suffix that could still grow into trailing whitespace and a closing fence.
+_TRAILING_RE = re.compile(r"\s*(?:`{1,3}\s*)?\Z")
+
+_GENDERS = {"male", "female", "transgender"}
+_COLLEGE_TYPES = {"engineering", "polytechnic", "iti", "arts"}
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_FILLER_WORDS = {
+    "i", "we", "need", "want", "show", "me", "find", "get", "give", "list", "please",
+    "all", "the", "a", "any", "are", "there", "of", "who", "freshers", "fresher",
+    "candidate", "candidates", "student", "students", "profiles", "people",
+}
+_ARTS_RE = re.compile(r"\barts\s*(?:and|&)\s*science\b", re.IGNORECASE)
+_COUNT_RE = re.compile(r"\b(?:how\s+many|count\s+of|count)\b", re.IGNORECASE)
+_TOP_RE = re.compile(r"\btop\s+(\d+|" + "|".join(_NUMBER_WORDS) + r")\b", re.IGNORECASE)
+_LOCATION_RE = re.compile(r"\b(?:from|in)\s+([a-z]+)\b", re.IGNORECASE)
+
+_CACHE_SIZE = 1024
+_ORM_CACHE: OrderedDict[str, str] = OrderedDict()
 
+# Optional cache shared by all workers; only the in-process LRU is used without it.
+_REDIS_URL = os.getenv("REDIS_URL")
+# Short timeouts so an unreachable Redis turns into a quick cache miss.
+_REDIS = (
+    Redis.from_url(_REDIS_URL, socket_connect_timeout=0.2, socket_timeout=0.2)
+    if _REDIS_URL
+    else None
+)
+_REDIS_TTL = 86400
+
+_PROMPT_PREFIX = """Convert the query into ONE single-line Django ORM call. No markdown, no extra text, no quotes.
+
+FIELDS (CandidateProfile.objects.filter):
+user__first_name, user__email, user__phone, permanent_address_district, college__name, college__district, college__affiliated_university, college__category, college__branch, college__type, year_of_passout, medium, mode_of_study, stream, certifications__name -> __icontains
+gender='male'|'female'|'other'|'transgender' (exact); dob__exact|gt|gte|lt|lte; placement_status=True|False
+
+RULES:
+- Return .filter(...), .filter(...).all()[:N] for "top N", or .filter(...).count() for "how many". Number words -> digits.
+- Location -> permanent_address_district__icontains. college__type: 'engineering', 'polytechnic', 'iti', 'arts' (Arts & Science).
+- Skill/course/subject/certification 'X' -> certifications__name__icontains='X', certifications__is_uploaded_by_nm=True (always both).
+- "industry 4.0" means any of 'industry 4.0', 'iot', 'machine learning': OR three such Q(...) certification filters.
+- placement_status=False by default; True if experienced/working/placed/employed.
+- Several values for one field -> OR them with Q(...) | Q(...). All Q(...) args come before kwargs; never repeat a kwarg.
+
+EXAMPLES:
+"Female engineering candidates in Coimbatore who are working"
+-> CandidateProfile.objects.filter(gender='female', college__type__icontains='engineering', permanent_address_district__icontains='Coimbatore', placement_status=True)
+"Female candidates from Chennai or Karur with Python or IoT skills"
+-> CandidateProfile.objects.filter(Q(permanent_address_district__icontains='Chennai') | Q(permanent_address_district__icontains='Karur'), Q(certifications__name__icontains='Python', certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='IoT', certifications__is_uploaded_by_nm=True), gender='female', placement_status=False)
+"How many male candidates passed out in 2025"
+-> CandidateProfile.objects.filter(gender='male', year_of_passout__icontains='2025', placement_status=False).count()
+"Top five ITI candidates from Erode"
+-> CandidateProfile.objects.filter(college__type__icontains='iti', permanent_address_district__icontains='Erode', placement_status=False).all()[:5]
+"எனக்கு சென்னையிலிருந்து பெண்கள் தேவை"
+-> CandidateProfile.objects.filter(gender='female', permanent_address_district__icontains='Chennai', placement_status=False)
+
+QUERY:
+"""
 
-def generate_filters_with_ai(user_query: str) -> str:
-    model = AIService(model_name=os.getenv("AI_MODEL"))
+# Changing the model or the prompt starts a fresh set of shared cache entries.
+_REDIS_NAMESPACE = sha1(f"{_MODEL}\0{_PROMPT_PREFIX}".encode()).hexdigest()[:16]
 
+
+async def startup() -> None:
+    """Warms the AI client's connection pool before the first request."""
+    await _AI_SERVICE.warm_up()
+
+
+async def shutdown() -> None:
+    """Closes the AI client and the shared cache connection."""
+    await _AI_SERVICE.close()
+    if _REDIS is not None:
+        await _REDIS.aclose()
+
+
+def _strip_fences(raw: str) -> str:
+    """Drops a surrounding ```/```python fence if the model added one anyway."""
+    text = raw.strip()
+    if text.startswith("```"):
+        if "\n" in text:
+            text = text.partition("\n")[2]
+        else:
+            text = text.removeprefix("```").removeprefix("python")
+    return text.removesuffix("```").strip()
+
+
+def try_fast_parse(user_query: str) -> Optional[str]:
+    """
+       Builds the ORM query for simple gender/college type/district queries without the AI model.
+
+       :param user_query: The user's natural language query.
+       :return: The ORM query string, or None if the query needs the AI model.
+    """
+    text = _ARTS_RE.sub("arts", user_query)
+
+    is_count = False
+    if match := _COUNT_RE.search(text):
+        is_count = True
+        text = text[:match.start()] + " " + text[match.end():]
+
+    limit = None
+    if match := _TOP_RE.search(text):
+        value = match.group(1).lower()
+        limit = _NUMBER_WORDS.get(value) or int(value)
+        if limit == 0:
+            return None
+        text = text[:match.start()] + " " + text[match.end():]
+
+    district = None
+    locations = _LOCATION_RE.findall(text)
+    if len(locations) > 1:
+        return None
+    if locations:
+        if locations[0].lower() in _GENDERS | _COLLEGE_TYPES | _FILLER_WORDS:
+            return None
+        district = locations[0].title()
+        text = _LOCATION_RE.sub(" ", text)
+
+    genders, college_types = [], []
+    for word in text.lower().split():
+        word = word.strip(".,?!")
+        if word in _GENDERS:
+            genders.append(word)
+        elif word in _COLLEGE_TYPES:
+            college_types.append(word)
+        elif word and word not in _FILLER_WORDS:
+            return None
+
+    if len(genders) > 1 or len(college_types) > 1 or (is_count and limit is not None):
+        return None
+    if not (genders or college_types or district):
+        return None
+
+    kwargs = []
+    if genders:
+        kwargs.append(f"gender='{genders[0]}'")
+    if college_types:
+        kwargs.append(f"college__type__icontains='{college_types[0]}'")
+    if district:
+        kwargs.append(f"permanent_address_district__icontains='{district}'")
+    kwargs.append("placement_status=False")
+
+    orm = f"CandidateProfile.objects.filter({', '.join(kwargs)})"
+    if is_count:
+        return orm + ".count()"
+    if limit is not None:
+        return orm + f".all()[:{limit}]"
+    return orm
+
+
+async def _strip_stream_fences(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Streaming counterpart of _strip_fences: the joined output matches what it returns."""
+    chunks = aiter(chunks)
+    head = ""
+    async for chunk in chunks:
+        head += chunk
+        text = head.lstrip()
+        # Only drop an opening fence line once something follows it; a bare trailing
+        # newline could still turn out to be the end of a single-line fenced reply.
+        if text.startswith("```") and "\n" in text.rstrip():
+            head = text.partition("\n")[2]
+            break
+        if len(text) >= 3 and not text.startswith("```"):
+            break
+    else:
+        if text := _strip_fences(head):
+            yield text
+        return
+
+    held = head.lstrip()
+    while True:
+        cut = _TRAILING_RE.search(held).start()
+        if cut:
+            yield held[:cut]
+            held = held[cut:]
+        try:
+            held += await anext(chunks)
+        except StopAsyncIteration:
+            break
+
+    tail = held.rstrip()
+    if tail.endswith("```"):
+        tail = tail[:-3].rstrip()
+    if tail:
+        yield tail
+
+
+def _normalize_query(user_query: str) -> str:
+    return " ".join(user_query.lower().split())
+
+
+def _redis_key(key: str) -> str:
+    return f"orm:{_REDIS_NAMESPACE}:{sha1(key.encode()).hexdigest()}"
+
+
+def _lru_put(key: str, orm: str) -> None:
+    _ORM_CACHE[key] = orm
+    if len(_ORM_CACHE) > _CACHE_SIZE:
+        _ORM_CACHE.popitem(last=False)
+
+
+async def _cache_get(key: str) -> Optional[str]:
+    if key in _ORM_CACHE:
+        _ORM_CACHE.move_to_end(key)
+        return _ORM_CACHE[key]
+    if _REDIS is None:
+        return None
+    try:
+        cached = await _REDIS.get(_redis_key(key))
+    except RedisError:
+        return None
+    if cached is None:
+        return None
+    orm = cached.decode()
+    _lru_put(key, orm)
+    return orm
+
+
+async def _cache_put(key: str, orm: str) -> None:
+    _lru_put(key, orm)
+    if _REDIS is None:
+        return
+    try:
+        await _REDIS.set(_redis_key(key), orm, ex=_REDIS_TTL)
+    except RedisError:
+        pass
+
+
+async def generate_filters_with_ai_async(user_query: str) -> str:
     """
        Generates a Django ORM query string from a natural language query using an AI model.
 
        :param user_query: The user's natural language query.
        :return: A single-line Django ORM query as a string.
     """
-    prompt = f"""
-    You are a Django ORM query generator. Convert the given natural language query into a valid **single-line** Django ORM call.
-
-MODEL STRUCTURE:
-CandidateProfile.objects.filter(
-    user__first_name__icontains=…,
-    dob__exact=… | dob__gt=… | dob__gte=… | dob__lt=… | dob__lte=…,
-    gender='male' | 'female' | 'other' | 'transgender',  # exact only
-    user__email__icontains=…,
-    user__phone__icontains=…,
-    permanent_address_district__icontains=…,
-    college__name__icontains=…,
-    college__district__icontains=…,
-    college__affiliated_university__icontains=…,
-    college__category__icontains=…,
-    college__branch__icontains=…,
-    college__type__icontains=…,
-    year_of_passout__icontains=…,
-    medium__icontains=…,
-    mode_of_study__icontains=…,
-    stream__icontains=…,
-    certifications__name__icontains=…
-    placement_status= True | False
-)
+    if (orm := try_fast_parse(user_query)) is not None:
+        return orm
+    key = _normalize_query(user_query)
+    if (orm := await _cache_get(key)) is not None:
+        return orm
 
-RULES:
-1. Return only: `CandidateProfile.objects.filter(...)` or with `.all()[:N]` or `.count()`.
-2. Output must be a **single line**, with **no markdown**, **no extra text**, and **no quotes** around the call.
-3. Use `icontains` for all text fields; use **exact match** for gender.
-4. For `dob`, support filters: `exact`, `gt`, `gte`, `lt`, `lte`.
-5. Convert number words to digits (e.g., "five" → 5).
-6. If a specific number of students is mentioned (e.g., "top 5"), use `.all()[:N]`.
-7. If the query asks for a count (e.g., "how many students"), return `.count()`.
-8. If any **skill**, **course**, **certifications**, or **subject** is mentioned (e.g., "Python", "Deep Learning"), match only using:
-   → `certifications__name__icontains='X'`
-9. For location mentions (e.g., "students in Chennai"), match using:
-   → `permanent_address_district__icontains='Chennai'`
-10. **STRICT Q() usage rules:**
-    - Always place **all Q(...) conditions first** inside `.filter(...)`, before any normal kwargs.
-    - Combine OR conditions for repeated fields using Q objects.
-    - Example: If multiple values for same field (e.g., multiple districts), use:
-      `Q(permanent_address_district__icontains='A') | Q(permanent_address_district__icontains='B')`
-    - Combine multiple Q expressions properly using `|` or `&`.
-    - Do NOT repeat the same keyword argument in `.filter(...)`.
-
-SPECIAL CASES:
-- Engineering Candidates:  
-  → `college__type__icontains='engineering'`
-- Polytechnic Candidates:  
-  → `college__type__icontains='polytechnic'`
-- ITI Candidates:  
-  → `college__type__icontains='iti'`
-- Arts and Science or Arts & Science:  
-  → `college__type__icontains='arts'`
-- Gender:
-  - Male → `gender='male'`
-  - Female → `gender='female'`
-  - Other → `gender='other'`
-  - Transgender → `gender='transgender'`
-  
-PLACEMENT STATUS RULE:
-- By default, **always include `placement_status=False`** in the filter.
-- If the query refers to "experienced", "working", "already placed", "got a job", "employed", etc., 
-  then instead use `placement_status=True`.
-  
-CERTIFICATION RULE (IMPORTANT)
-When matching skills, courses, subjects, or certifications:
-- ALWAYS use:
-    certifications__name__icontains='X', certifications__is_uploaded_by_nm=True
-- Never match certifications where is_uploaded_by_nm=False
-- Candidate should be INCLUDED if ANY certification with is_uploaded_by_nm=True matches
-- Non-NM certifications must never be used in filtering.
-
-Examples of correct use:
-    certifications__name__icontains='python', certifications__is_uploaded_by_nm=True
-    Q(certifications__name__icontains='gen ai', certifications__is_uploaded_by_nm=True)
+    async with _AI_SEMAPHORE:
+        raw = await _AI_SERVICE.chat(
+            messages=[{"role": "user", "content": f'"{user_query}"'}],
+            system=_PROMPT_PREFIX,
+            max_tokens=200,
+            stop=["\n\n"],
+        )
+    orm = _strip_fences(raw)
+    validate_orm(orm)
+    await _cache_put(key, orm)
+    return orm
 
 
-EXAMPLES:
-- "Find male candidates from 2025 passout batch taking Deep Learning"  
-  → CandidateProfile.objects.filter(certifications__name__icontains='Deep Learning', certifications__is_uploaded_by_nm=True, gender='male', year_of_passout__icontains='2025', placement_status=False)
-
-- "Candidates from Chennai with Python skill"  
-  → CandidateProfile.objects.filter(certifications__name__icontains='Python', certifications__is_uploaded_by_nm=True, permanent_address_district__icontains='Chennai', placement_status=False)
-
-- "Female engineering candidates in Coimbatore"  
-  → CandidateProfile.objects.filter(gender='female', college__type__icontains='engineering', permanent_address_district__icontains='Coimbatore', placement_status=False)
-
-- "Female candidates from Chennai or Chengalpattu with IoT and PEB Design skills"  
-  → CandidateProfile.objects.filter(Q(permanent_address_district__icontains='Chennai') | Q(permanent_address_district__icontains='Chengalpattu'),Q(certifications__name__icontains='IoT',  certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='PEB Design',  certifications__is_uploaded_by_nm=True),gender='female', placement_status=False)
-  
-- "Female engineering candidates in Coimbatore who are currently working"
-  → CandidateProfile.objects.filter(gender='female', college__type__icontains='engineering', permanent_address_district__icontains='Coimbatore', placement_status=True)
-  
-- "எனக்கு சென்னையிலிருந்து பெண்கள் தேவை"
-  → CandidateProfile.objects.filter(Q(permanent_address_district__icontains='Chennai'), gender='female', placement_status=False)
-
-- "எனக்கு சென்னை மற்றும் செங்கல்பட்டில் இருந்து ஐடிஐ மாணவர்கள் வேண்டும்"
-  → CandidateProfile.objects.filter(Q(permanent_address_district__icontains='Chennai') | Q(permanent_address_district__icontains='Chengalpattu'), college__type__icontains='iti', placement_status=False)
-
-- "எனக்கு சென்னை மற்றும் செங்கல்பட்டில் இருந்து பாலிடெக்னிக் விண்ணப்பதாரர் தேவை"    
-  → CandidateProfile.objects.filter(Q(permanent_address_district__icontains='Chennai') | Q(permanent_address_district__icontains='Chengalpattu'), college__type__icontains='polytechnic', gender='female', placement_status=False)
-
-- "எனக்கு ஈரோட்டில் இருந்து இன்ஜினியரிங் விண்ணப்பதாரர் தேவை"
-  → CandidateProfile.objects.filter(gender='female', college__type__icontains='engineering', permanent_address_district__icontains='Erode', placement_status=False)
-
-- I need Candidate who have certifications from industry 4.0
-  → CandidateProfile.objects.filter(Q(certifications__name__icontains='industry 4.0',  certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='iot',  certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='machine learning',  certifications__is_uploaded_by_nm=True))
- 
- - I need male candidates in Coimbatore region who has studied industry 4.0 and passed out in 2024 and 2025 candidates
-  → CandidateProfile.objects.filter(Q(certifications__name__icontains='industry 4.0',  certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='iot',  certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='machine learning',  certifications__is_uploaded_by_nm=True),Q(year_of_passout__icontains='2024') | Q(year_of_passout__icontains='2025'),   gender='male',permanent_address_district__icontains='Coimbatore',placement_status=False)
-  
-- I need freshers from chennai who have done generative ai skills
-  → CandidateProfile.objects.filter(certifications__name__icontains='generative ai', certifications__is_uploaded_by_nm=True, permanent_address_district__icontains='chennai', placement_status=False)
-  
-- I need experienced candidates who has skill on generative ai
-  → CandidateProfile.objects.filter(certifications__name__icontains='generative ai', certifications__is_uploaded_by_nm=True, placement_status=True)
-  
-- I need Female working professionals with python and gen ai skills from chennai and karur
-  → CandidateProfile.objects.filter(Q(permanent_address_district__icontains='chennai') | Q(permanent_address_district__icontains='karur'),  Q(certifications__name__icontains='python',  certifications__is_uploaded_by_nm=True) |  Q(certifications__name__icontains='generative ai',  certifications__is_uploaded_by_nm=True), gender='female',placement_status=True)
-  
-- I Need experienced candidates with iot skills
-  → CandidateProfile.objects.filter(certifications__name__icontains='iot', certifications__is_uploaded_by_nm=True, placement_status=True)
-QUERY:
-"{user_query}"
+def generate_filters_with_ai_sync(user_query: str) -> str:
+    """
+       Blocking wrapper around generate_filters_with_ai_async for CLI scripts and tests.
+       Every call runs on one background event loop that lives for the rest of the process.
 
-"""
+       :param user_query: The user's natural language query.
+       :return: A single-line Django ORM query as a string.
+    """
+    global _PORTAL
+    with _PORTAL_LOCK:
+        if _PORTAL is None:
+            portal_cm = start_blocking_portal()
+            _PORTAL = portal_cm.__enter__()
+            atexit.register(portal_cm.__exit__, None, None, None)
+    return _PORTAL.call(generate_filters_with_ai_async, user_query)
+
+
+async def stream_filters_with_ai(user_query: str) -> AsyncIterator[str]:
+    """
+       Streams the Django ORM query for a natural language query.
+       The model's reply is buffered and checked with validate_orm before anything is
+       yielded, so invalid output raises ValueError instead of reaching the client.
+
+       :param user_query: The user's natural language query.
+       :return: An async iterator yielding the validated ORM query.
+    """
+    if (orm := try_fast_parse(user_query)) is not None:
+        yield orm
+        return
+    key = _normalize_query(user_query)
+    if (orm := await _cache_get(key)) is not None:
+        yield orm
+        return
+
+    # The slot is released as soon as the upstream stream ends, not when the client
+    # has finished reading.
+    async with _AI_SEMAPHORE:
+        pieces = [piece async for piece in _strip_stream_fences(_AI_SERVICE.chat_stream(
+            messages=[{"role": "user", "content": f'"{user_query}"'}],
+            system=_PROMPT_PREFIX,
+            max_tokens=200,
+            stop=["\n\n"],
+        ))]
+    orm = "".join(pieces)
+    validate_orm(orm)
+    await _cache_put(key, orm)
+    yield orm
+
+
+async def generate_many(user_queries: list[str]) -> list[str]:
+    """
+       Generates ORM queries for independent natural language queries concurrently;
+       the shared semaphore keeps at most AI_MAX_CONCURRENCY AI calls in flight.
+
+       :param user_queries: The user's natural language queries.
+       :return: The ORM query strings, in the same order as the input.
+    """
+    return list(
+        await asyncio.gather(*(generate_filters_with_ai_async(q) for q in user_queries))
+    )
+
+
+async def generate_batch_with_ai(user_queries: list[str]) -> list[str]:
+    """
+       Generates one Django ORM query per natural language query with a single AI call.
+
+       :param user_queries: The user's natural language queries.
+       :return: The ORM query strings, in the same order as the input.
+    """
+    keys = [_normalize_query(q) for q in user_queries]
+    results = {}
+    pending = {}
+    for key, query in zip(keys, user_queries):
+        if key in results or key in pending:
+            continue
+        if (orm := try_fast_parse(query)) is not None:
+            results[key] = orm
+        elif (orm := await _cache_get(key)) is not None:
+            results[key] = orm
+        else:
+            pending[key] = query
 
-    async def run_chat():
-        raw = await model.chat(messages=[{"role": "user", "content": prompt}])
-        return re.sub(
-            r"^```(?:python)?\s*|\s*```$", "", raw.strip(), flags=re.MULTILINE
-        ).strip()
+    if pending:
+        numbered = "\n".join(
+            f'{i}. "{query}"' for i, query in enumerate(pending.values(), start=1)
+        )
+        async with _AI_SEMAPHORE:
+            raw = await _AI_SERVICE.chat(
+                messages=[{
+                    "role": "user",
+                    "content": "Respond with one ORM call per line, in this order:\n" + numbered,
+                }],
+                system=_PROMPT_PREFIX,
+                max_tokens=200 * len(pending),
+            )
+        lines = [
+            _NUMBERING_RE.sub("", line).strip()
+            for line in _strip_fences(raw).splitlines()
+            if line.strip()
+        ]
+        fallback = dict(pending)
+        if len(lines) == len(pending):
+            for key, orm in zip(pending, lines):
+                try:
+                    validate_orm(orm)
+                except ValueError:
+                    continue
+                results[key] = orm
+                del fallback[key]
+                await _cache_put(key, orm)
+        if fallback:
+            # Lines that were merged, split or invalid are answered one by one instead.
+            results.update(zip(fallback, await generate_many(list(fallback.values()))))
 
-    return asyncio.run(run_chat())
+    return [results[key] for key in keys]
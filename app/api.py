@@ -1,15 +1,58 @@
 from fastapi import APIRouter, Header, HTTPException
-from .schemas import QueryRequest, QueryResponse
-from .ai_orm import generate_filters_with_ai
+from fastapi.responses import StreamingResponse
+from services.ai_service import AIServiceUnavailable
+from .schemas import BatchQueryRequest, BatchQueryResponse, QueryRequest, QueryResponse
+from .ai_orm import generate_batch_with_ai, generate_filters_with_ai_async, stream_filters_with_ai
 import os
 
 router = APIRouter()
 SECRET = os.getenv("BACKEND_SECRET")
+UNAVAILABLE_DETAIL = "AI service is temporarily unavailable"
 
 
 @router.post("/generate", response_model=QueryResponse)
-def generate(req: QueryRequest, backend_secret: str = Header(None)):
+async def generate(req: QueryRequest, backend_secret: str = Header(None)):
     # if not backend_secret or backend_secret != SECRET:
     #     raise HTTPException(status_code=401, detail="Invalid credentials")
-    orm = generate_filters_with_ai(req.query)
+    try:
+        orm = await generate_filters_with_ai_async(req.query)
+    except AIServiceUnavailable:
+        raise HTTPException(status_code=503, detail=UNAVAILABLE_DETAIL)
+    except ValueError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
     return QueryResponse(orm=orm)
+
+
+@router.post("/generate_stream")
+async def generate_stream(req: QueryRequest, backend_secret: str = Header(None)):
+    # if not backend_secret or backend_secret != SECRET:
+    #     raise HTTPException(status_code=401, detail="Invalid credentials")
+    # StreamingResponse sends the status line before iterating, so pull the first
+    # chunk here to still report provider failures and invalid output.
+    chunks = stream_filters_with_ai(req.query)
+    try:
+        first = await anext(chunks, "")
+    except AIServiceUnavailable:
+        raise HTTPException(status_code=503, detail=UNAVAILABLE_DETAIL)
+    except ValueError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(body(), media_type="text/plain")
+
+
+@router.post("/generate_batch", response_model=BatchQueryResponse)
+async def generate_batch(req: BatchQueryRequest, backend_secret: str = Header(None)):
+    # if not backend_secret or backend_secret != SECRET:
+    #     raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        orms = await generate_batch_with_ai(req.queries)
+    except AIServiceUnavailable:
+        raise HTTPException(status_code=503, detail=UNAVAILABLE_DETAIL)
+    except ValueError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+    return BatchQueryResponse(orms=orms)
@@ -1,5 +1,18 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from .ai_orm import shutdown, startup
 from .api import router
 
-app = FastAPI(title="AI ORM Generator API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    yield
+    await shutdown()
+
+
+app = FastAPI(
+    title="AI ORM Generator API",
+    lifespan=lifespan,
+)
 app.include_router(router, prefix="/api")
@@ -0,0 +1,92 @@
+import ast
+
+_TEXT_LOOKUPS = {
+    "user__first_name", "user__email", "user__phone", "permanent_address_district",
+    "college__name", "college__district", "college__affiliated_university",
+    "college__category", "college__branch", "college__type", "year_of_passout",
+    "medium", "mode_of_study", "stream", "certifications__name",
+}
+_ALLOWED_KWARGS = (
+    {f"{field}__icontains" for field in _TEXT_LOOKUPS}
+    | {f"dob__{op}" for op in ("exact", "gt", "gte", "lt", "lte")}
+    | {"gender", "placement_status", "certifications__is_uploaded_by_nm"}
+)
+
+
+def _is_method_call(node: ast.AST, name: str) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == name
+        and not node.args
+        and not node.keywords
+    )
+
+
+def _check_kwargs(keywords: list[ast.keyword]) -> None:
+    seen = set()
+    for kw in keywords:
+        if kw.arg not in _ALLOWED_KWARGS:
+            raise ValueError(f"Unsupported filter: {kw.arg}")
+        if kw.arg in seen:
+            raise ValueError(f"Repeated filter: {kw.arg}")
+        seen.add(kw.arg)
+        if not isinstance(kw.value, ast.Constant) or not isinstance(
+            kw.value.value, (str, int, bool)
+        ):
+            raise ValueError(f"Filter {kw.arg} must be a literal value")
+
+
+def _check_q(node: ast.AST) -> None:
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitOr, ast.BitAnd)):
+        _check_q(node.left)
+        _check_q(node.right)
+        return
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "Q"
+        and not node.args
+    ):
+        _check_kwargs(node.keywords)
+        return
+    raise ValueError("Positional filter arguments must be Q(...) expressions")
+
+
+def validate_orm(orm: str) -> None:
+    """
+       Checks that a generated ORM string only uses the supported CandidateProfile query shape.
+
+       :param orm: The ORM query string returned by the AI model.
+       :raises ValueError: If the string is not a supported ORM query.
+    """
+    try:
+        node = ast.parse(orm, mode="eval").body
+    except SyntaxError as exc:
+        raise ValueError(f"Generated ORM is not valid Python: {exc.msg}") from None
+
+    if isinstance(node, ast.Subscript):
+        bound = node.slice
+        if not (
+            isinstance(bound, ast.Slice)
+            and bound.lower is None
+            and bound.step is None
+            and isinstance(bound.upper, ast.Constant)
+            and type(bound.upper.value) is int
+            and _is_method_call(node.value, "all")
+        ):
+            raise ValueError("Only .all()[:N] slicing is supported")
+        node = node.value.func.value
+    elif _is_method_call(node, "count"):
+        node = node.func.value
+
+    if not (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "filter"
+        and ast.unparse(node.func.value) == "CandidateProfile.objects"
+    ):
+        raise ValueError("Generated ORM must be a CandidateProfile.objects.filter(...) call")
+    for arg in node.args:
+        _check_q(arg)
+    _check_kwargs(node.keywords)
@@ -1,7 +1,14 @@
-from pydantic import BaseModel
+from typing import List
+from pydantic import BaseModel, Field
 
 class QueryRequest(BaseModel):
     query: str
 
 class QueryResponse(BaseModel):
     orm: str
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=16)
+
+class BatchQueryResponse(BaseModel):
+    orms: List[str]
@@ -1,23 +1,190 @@
 import os
-from typing import List, Optional
-from openai import AsyncOpenAI
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAIError,
+    RateLimitError,
+)
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_API_KEY = os.getenv("AI_API_KEY")
+_API_BASE_URL = os.getenv("AI_API_BASE_URL")
+
+# Greedy, single-choice decoding so identical prompts give identical ORM strings.
+_DEFAULT_SAMPLING = {"temperature": 0, "top_p": 1, "n": 1, "seed": 0}
+
+# Provider errors worth retrying; APITimeoutError is a subclass of APIConnectionError.
+_TRANSIENT_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+class AIServiceUnavailable(Exception):
+    """Raised when the AI provider keeps failing or its circuit breaker is open."""
+
+
+class _CircuitBreaker:
+    def __init__(self, fail_max: int = 10, reset_timeout: float = 30):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    def before_call(self) -> None:
+        if self.opened_at is None:
+            return
+        # Once reset_timeout has passed, a single trial call goes through (half-open);
+        # everything else keeps failing fast until that trial settles.
+        if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+            raise AIServiceUnavailable("AI provider is temporarily unavailable")
+        self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= self.fail_max:
+            self.opened_at = time.monotonic()
+
+    def abandon_trial(self) -> None:
+        self.trial_in_flight = False
+
+
+_BREAKERS: Dict[str, _CircuitBreaker] = {}
+
+
+@retry(
+    retry=retry_if_exception_type(_TRANSIENT_ERRORS),
+    wait=wait_exponential_jitter(multiplier=0.2, max=4),
+    stop=stop_after_attempt(4),
+    reraise=True,
+)
+async def _create_with_retry(create, **params):
+    return await create(**params)
+
+
 class AIService:
-    def __init__(self, model_name: str, base_url: Optional[str] = None):
+    def __init__(
+        self,
+        model_name: str,
+        base_url: Optional[str] = None,
+        tokenizer: Optional[Any] = None,
+    ):
+        if not _API_KEY:
+            raise RuntimeError("AI_API_KEY environment variable is not set")
         self.model_name = model_name
+        # Retries are handled by _create_with_retry, so the client's own are disabled.
         self.client = AsyncOpenAI(
-            api_key=os.getenv("AI_API_KEY"),
-            base_url=base_url or os.getenv("AI_API_BASE_URL"),
+            api_key=_API_KEY,
+            base_url=base_url or _API_BASE_URL,
+            max_retries=0,
         )
+        self._breaker = _BREAKERS.setdefault(str(self.client.base_url), _CircuitBreaker())
+        # Optional Hugging Face tokenizer for vLLM-compatible backends: prompts are
+        # sent as token IDs and the rendered system prefix is only tokenized once.
+        self.tokenizer = tokenizer
+        self._prefix_ids: Dict[str, Tuple[str, List[int]]] = {}
+
+    async def _create(self, create, **params):
+        self._breaker.before_call()
+        try:
+            response = await _create_with_retry(create, **params)
+        except _TRANSIENT_ERRORS as exc:
+            self._breaker.record_failure()
+            raise AIServiceUnavailable(str(exc)) from exc
+        except BaseException:
+            # Non-transient errors (e.g. a 400 or bad credentials) and cancellation
+            # neither close the breaker nor count towards opening it.
+            self._breaker.abandon_trial()
+            raise
+        self._breaker.record_success()
+        return response
+
+    def _prompt_token_ids(self, messages: List[dict], system: Optional[str]) -> List[int]:
+        prefix_text, prefix_ids = "", []
+        if system is not None:
+            messages = [{"role": "system", "content": system}, *messages]
+            if system not in self._prefix_ids:
+                text = self.tokenizer.apply_chat_template(messages[:1], tokenize=False)
+                self._prefix_ids[system] = (
+                    text, self.tokenizer.encode(text, add_special_tokens=False)
+                )
+            prefix_text, prefix_ids = self._prefix_ids[system]
+        text = self.tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True
+        )
+        if not text.startswith(prefix_text):
+            return self.tokenizer.encode(text, add_special_tokens=False)
+        return prefix_ids + self.tokenizer.encode(
+            text[len(prefix_text):], add_special_tokens=False
+        )
+
+    async def warm_up(self) -> None:
+        # Opens a pooled keep-alive connection (DNS + TCP + TLS) ahead of the first real call.
+        try:
+            await self.client.with_options(timeout=5).models.list()
+        except OpenAIError:
+            pass
 
-    async def chat(self, messages: List[dict], **kwargs):
-        response = await self.client.chat.completions.create(
+    async def close(self) -> None:
+        await self.client.close()
+
+    async def chat(
+        self,
+        messages: List[dict],
+        system: Optional[str] = None,
+        max_tokens: int = 256,
+        **kwargs,
+    ):
+        if self.tokenizer is not None:
+            response = await self._create(
+                self.client.completions.create,
+                model=self.model_name,
+                prompt=self._prompt_token_ids(messages, system),
+                max_tokens=max_tokens,
+                **{**_DEFAULT_SAMPLING, **kwargs},
+            )
+            return response.choices[0].text
+
+        # Keep the static instructions as a separate, byte-identical leading
+        # message so the provider's automatic prefix caching can reuse it.
+        if system is not None:
+            messages = [{"role": "system", "content": system}, *messages]
+        response = await self._create(
+            self.client.chat.completions.create,
             model=self.model_name,
             messages=messages,
-            max_tokens=1024,
-            **kwargs,
+            max_tokens=max_tokens,
+            **{**_DEFAULT_SAMPLING, **kwargs},
         )
         return response.choices[0].message.content
+
+    async def chat_stream(
+        self,
+        messages: List[dict],
+        system: Optional[str] = None,
+        max_tokens: int = 256,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        if system is not None:
+            messages = [{"role": "system", "content": system}, *messages]
+        response = await self._create(
+            self.client.chat.completions.create,
+            model=self.model_name,
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True,
+            **{**_DEFAULT_SAMPLING, **kwargs},
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
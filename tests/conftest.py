@@ -0,0 +1,5 @@
+import os
+
+# app.ai_orm builds its AI client at import time; no request is made in these tests.
+os.environ.setdefault("AI_MODEL", "test-model")
+os.environ.setdefault("AI_API_KEY", "test-key")
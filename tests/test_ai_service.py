@@ -0,0 +1,148 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+from tenacity import wait_none
+
+from services import ai_service
+from services.ai_service import AIService, AIServiceUnavailable, _CircuitBreaker
+
+_REQUEST = httpx.Request("POST", "http://provider.test/v1/chat/completions")
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class _Calls:
+    """Fake `create` callable that raises or returns the queued outcomes in order."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.count = 0
+
+    async def __call__(self, **params):
+        self.count += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if isinstance(outcome, asyncio.Event):
+            await outcome.wait()
+            return "ok"
+        return outcome
+
+
+def _connection_error():
+    return openai.APIConnectionError(request=_REQUEST)
+
+
+def _auth_error():
+    return openai.AuthenticationError(
+        "bad key", response=httpx.Response(401, request=_REQUEST), body=None
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(ai_service, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def service(monkeypatch, clock):
+    monkeypatch.setattr(
+        ai_service, "_create_with_retry",
+        ai_service._create_with_retry.retry_with(wait=wait_none()),
+    )
+    service = AIService(model_name="test-model")
+    service._breaker = _CircuitBreaker(fail_max=2, reset_timeout=30)
+    return service
+
+
+def _open(service):
+    for _ in range(2):
+        with pytest.raises(AIServiceUnavailable):
+            asyncio.run(service._create(_Calls(_connection_error())))
+    assert service._breaker.opened_at is not None
+
+
+def test_transient_errors_are_retried(service):
+    calls = _Calls(_connection_error(), _connection_error(), "ok")
+    assert asyncio.run(service._create(calls)) == "ok"
+    assert calls.count == 3
+    assert service._breaker.failures == 0
+
+
+def test_open_breaker_fails_fast(service):
+    _open(service)
+    calls = _Calls("ok")
+    with pytest.raises(AIServiceUnavailable):
+        asyncio.run(service._create(calls))
+    assert calls.count == 0
+
+
+def test_half_open_allows_a_single_trial(service, clock):
+    _open(service)
+    clock.now += 31
+
+    async def scenario():
+        release = asyncio.Event()
+        trial = asyncio.create_task(service._create(_Calls(release)))
+        await asyncio.sleep(0)
+        with pytest.raises(AIServiceUnavailable):
+            await service._create(_Calls("ok"))
+        release.set()
+        return await trial
+
+    assert asyncio.run(scenario()) == "ok"
+    assert service._breaker.opened_at is None
+    assert asyncio.run(service._create(_Calls("ok"))) == "ok"
+
+
+def test_failed_trial_reopens_the_breaker(service, clock):
+    _open(service)
+    clock.now += 31
+    with pytest.raises(AIServiceUnavailable):
+        asyncio.run(service._create(_Calls(_connection_error())))
+    with pytest.raises(AIServiceUnavailable):
+        asyncio.run(service._create(_Calls("ok")))
+
+
+def test_non_transient_error_keeps_failure_count(service):
+    with pytest.raises(AIServiceUnavailable):
+        asyncio.run(service._create(_Calls(_connection_error())))
+    with pytest.raises(openai.AuthenticationError):
+        asyncio.run(service._create(_Calls(_auth_error())))
+    assert service._breaker.failures == 1
+
+
+def test_non_transient_error_releases_trial_without_closing(service, clock):
+    _open(service)
+    clock.now += 31
+    with pytest.raises(openai.AuthenticationError):
+        asyncio.run(service._create(_Calls(_auth_error())))
+    assert service._breaker.opened_at is not None
+    assert not service._breaker.trial_in_flight
+    assert asyncio.run(service._create(_Calls("ok"))) == "ok"
+
+
+def test_cancelled_trial_is_abandoned(service, clock):
+    _open(service)
+    clock.now += 31
+
+    async def scenario():
+        trial = asyncio.create_task(service._create(_Calls(asyncio.Event())))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(scenario())
+    assert not service._breaker.trial_in_flight
+    assert service._breaker.opened_at is not None
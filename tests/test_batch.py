@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app import ai_orm
+
+PYTHON_ORM = "CandidateProfile.objects.filter(certifications__name__icontains='python', certifications__is_uploaded_by_nm=True, placement_status=False)"
+JAVA_ORM = "CandidateProfile.objects.filter(certifications__name__icontains='java', certifications__is_uploaded_by_nm=True, placement_status=False)"
+
+
+class _FakeService:
+    """Answers batch prompts with `batch_reply` and single queries from `single`."""
+
+    def __init__(self, batch_reply, single=None):
+        self.batch_reply = batch_reply
+        self.single = single or {}
+        self.prompts = []
+
+    async def chat(self, messages, **kwargs):
+        content = messages[-1]["content"]
+        self.prompts.append(content)
+        if content.startswith("Respond"):
+            return self.batch_reply
+        return self.single[content.strip('"')]
+
+
+@pytest.fixture
+def fake_service(monkeypatch):
+    monkeypatch.setattr(ai_orm, "_ORM_CACHE", type(ai_orm._ORM_CACHE)())
+    monkeypatch.setattr(ai_orm, "_REDIS", None)
+
+    def install(*args, **kwargs):
+        service = _FakeService(*args, **kwargs)
+        monkeypatch.setattr(ai_orm, "_AI_SERVICE", service)
+        return service
+
+    return install
+
+
+def test_strips_numbering_from_reply_lines(fake_service):
+    fake_service(f"1. {PYTHON_ORM}\n\n 2) {JAVA_ORM}\n")
+    orms = asyncio.run(ai_orm.generate_batch_with_ai(["python people", "java people"]))
+    assert orms == [PYTHON_ORM, JAVA_ORM]
+
+
+def test_duplicate_queries_are_sent_once(fake_service):
+    service = fake_service(f"1. {PYTHON_ORM}\n2. {JAVA_ORM}")
+    orms = asyncio.run(ai_orm.generate_batch_with_ai(
+        ["python people", "Python   People", "java people"]
+    ))
+    assert orms == [PYTHON_ORM, PYTHON_ORM, JAVA_ORM]
+    assert len(service.prompts) == 1
+    assert service.prompts[0].count("\n") == 2
+
+
+def test_invalid_line_falls_back_for_that_query_only(fake_service):
+    service = fake_service(
+        f"1. {PYTHON_ORM}\n2. __import__('os').system('id')",
+        single={"java people": JAVA_ORM},
+    )
+    orms = asyncio.run(ai_orm.generate_batch_with_ai(["python people", "java people"]))
+    assert orms == [PYTHON_ORM, JAVA_ORM]
+    assert service.prompts[1:] == ['"java people"']
+    assert ai_orm._ORM_CACHE["python people"] == PYTHON_ORM
+
+
+def test_line_count_mismatch_falls_back_for_every_query(fake_service):
+    service = fake_service(
+        f"{PYTHON_ORM} {JAVA_ORM}",
+        single={"python people": PYTHON_ORM, "java people": JAVA_ORM},
+    )
+    orms = asyncio.run(ai_orm.generate_batch_with_ai(["python people", "java people"]))
+    assert orms == [PYTHON_ORM, JAVA_ORM]
+    assert sorted(service.prompts[1:]) == ['"java people"', '"python people"']
+
+
+def test_invalid_fallback_answer_is_reported(fake_service):
+    fake_service("1. DROP TABLE", single={"python people": "DROP TABLE"})
+    with pytest.raises(ValueError):
+        asyncio.run(ai_orm.generate_batch_with_ai(["python people"]))
@@ -0,0 +1,35 @@
+import pytest
+
+from app.ai_orm import try_fast_parse
+
+
+@pytest.mark.parametrize("query, orm", [
+    ("candidates from Chennai",
+     "CandidateProfile.objects.filter(permanent_address_district__icontains='Chennai', placement_status=False)"),
+    ("female iti candidates in Erode",
+     "CandidateProfile.objects.filter(gender='female', college__type__icontains='iti', permanent_address_district__icontains='Erode', placement_status=False)"),
+    ("How many male students from coimbatore?",
+     "CandidateProfile.objects.filter(gender='male', permanent_address_district__icontains='Coimbatore', placement_status=False).count()"),
+    ("top five arts and science students in Karur",
+     "CandidateProfile.objects.filter(college__type__icontains='arts', permanent_address_district__icontains='Karur', placement_status=False).all()[:5]"),
+    ("top 3 engineering candidates",
+     "CandidateProfile.objects.filter(college__type__icontains='engineering', placement_status=False).all()[:3]"),
+])
+def test_parses_simple_queries(query, orm):
+    assert try_fast_parse(query) == orm
+
+
+@pytest.mark.parametrize("query", [
+    "candidates from Chennai or Karur",
+    "candidates in chennai and karur",
+    "male and female candidates",
+    "male candidates with python skills",
+    "experienced candidates from chennai",
+    "எனக்கு சென்னையிலிருந்து பெண்கள் தேவை",
+    "candidates in engineering",
+    "top 0 male candidates",
+    "how many top 5 male candidates",
+    "show me all",
+])
+def test_falls_back_to_model(query):
+    assert try_fast_parse(query) is None
@@ -0,0 +1,37 @@
+import pytest
+
+from app.orm_validator import validate_orm
+
+
+@pytest.mark.parametrize("orm", [
+    "CandidateProfile.objects.filter(certifications__name__icontains='Deep Learning', certifications__is_uploaded_by_nm=True, gender='male', year_of_passout__icontains='2025', placement_status=False)",
+    "CandidateProfile.objects.filter(gender='female', college__type__icontains='engineering', permanent_address_district__icontains='Coimbatore', placement_status=True)",
+    "CandidateProfile.objects.filter(Q(permanent_address_district__icontains='Chennai') | Q(permanent_address_district__icontains='Chengalpattu'), Q(certifications__name__icontains='IoT', certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='PEB Design', certifications__is_uploaded_by_nm=True), gender='female', placement_status=False)",
+    "CandidateProfile.objects.filter(Q(certifications__name__icontains='industry 4.0', certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='iot', certifications__is_uploaded_by_nm=True) | Q(certifications__name__icontains='machine learning', certifications__is_uploaded_by_nm=True))",
+    "CandidateProfile.objects.filter(gender='male', year_of_passout__icontains='2025', placement_status=False).count()",
+    "CandidateProfile.objects.filter(college__type__icontains='iti', placement_status=False).all()[:5]",
+    "CandidateProfile.objects.filter(dob__gte='2000-01-01', placement_status=False)",
+])
+def test_accepts_supported_queries(orm):
+    validate_orm(orm)
+
+
+@pytest.mark.parametrize("orm", [
+    "CandidateProfile.objects.filter(gender='male').delete()",
+    "__import__('os').system('id')",
+    "DROP TABLE",
+    "CandidateProfile.objects.all()[:5]",
+    "CandidateProfile.objects.filter(gender='male')[:5]",
+    "CandidateProfile.objects.filter(gender='male').all()[-5:]",
+    "CandidateProfile.objects.filter(gender='male').all()[:5:2]",
+    "CandidateProfile.objects.filter(salary__gt=10)",
+    "CandidateProfile.objects.filter(gender='male', gender='female')",
+    "CandidateProfile.objects.filter(gender=None)",
+    "CandidateProfile.objects.filter(gender=get_gender())",
+    "CandidateProfile.objects.filter(~Q(gender='male'))",
+    "CandidateProfile.objects.filter(Q(gender='male') - Q(gender='female'))",
+    "CandidateProfile.objects.filter(**{'gender': 'male'})",
+])
+def test_rejects_unsupported_queries(orm):
+    with pytest.raises(ValueError):
+        validate_orm(orm)
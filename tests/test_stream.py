@@ -0,0 +1,108 @@
+import asyncio
+from itertools import combinations
+
+import pytest
+
+from app import ai_orm
+
+ORM = "CandidateProfile.objects.filter(gender='male')"
+
+
+async def _chunks(parts):
+    for part in parts:
+        yield part
+
+
+def _stream(parts):
+    async def collect():
+        return [piece async for piece in ai_orm._strip_stream_fences(_chunks(parts))]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("raw", [
+    ORM,
+    f"```python\n{ORM}\n```",
+    f"```\n{ORM}\n```\n",
+    f"```{ORM}```",
+    f"```python{ORM}```",
+    f"  {ORM}  \n",
+    f"```{ORM}```\n",
+    "Candidate `x`",
+    "Candidate `x` ",
+    "a````",
+    "a `` b",
+    "``",
+    "",
+])
+def test_matches_strip_fences_for_every_chunk_split(raw):
+    expected = ai_orm._strip_fences(raw)
+    for i, j in combinations(range(len(raw) + 1), 2):
+        assert "".join(_stream([raw[:i], raw[i:j], raw[j:]])) == expected, (i, j)
+
+
+def test_fence_split_across_chunks():
+    assert "".join(_stream(["`", "``py", "thon\n", ORM, "\n`", "``"])) == ORM
+
+
+def test_single_line_fence():
+    assert "".join(_stream([f"```{ORM}", "```"])) == ORM
+
+
+def test_empty_output():
+    assert _stream([]) == []
+    assert _stream(["", "  \n"]) == []
+
+
+class _FakeStreamService:
+    def __init__(self, parts):
+        self.parts = parts
+
+    async def chat_stream(self, messages, **kwargs):
+        for part in self.parts:
+            yield part
+
+
+@pytest.fixture
+def stream_service(monkeypatch):
+    monkeypatch.setattr(ai_orm, "_ORM_CACHE", type(ai_orm._ORM_CACHE)())
+    monkeypatch.setattr(ai_orm, "_REDIS", None)
+    monkeypatch.setattr(ai_orm, "_AI_SEMAPHORE", asyncio.Semaphore(1))
+
+    def install(parts):
+        monkeypatch.setattr(ai_orm, "_AI_SERVICE", _FakeStreamService(parts))
+
+    return install
+
+
+def test_stream_rejects_invalid_output_before_yielding(stream_service):
+    stream_service(["__import__('os')", ".system('id')"])
+
+    async def first():
+        return await anext(ai_orm.stream_filters_with_ai("python people"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(first())
+    assert "python people" not in ai_orm._ORM_CACHE
+
+
+def test_stream_releases_semaphore_before_client_reads(stream_service):
+    stream_service(["```\n", ORM, "\n```"])
+
+    async def scenario():
+        chunks = ai_orm.stream_filters_with_ai("python people")
+        first = await anext(chunks)
+        assert not ai_orm._AI_SEMAPHORE.locked()
+        return first + "".join([chunk async for chunk in chunks])
+
+    assert asyncio.run(scenario()) == ORM
+    assert ai_orm._ORM_CACHE["python people"] == ORM
+
+
+def test_stream_route_returns_502_for_invalid_output(stream_service):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    stream_service(["DROP TABLE"])
+    response = TestClient(app).post("/api/generate_stream", json={"query": "python people"})
+    assert response.status_code == 502
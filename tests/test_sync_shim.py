@@ -0,0 +1,57 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import ai_orm
+from services.ai_service import AIService
+
+ORM = "CandidateProfile.objects.filter(certifications__name__icontains='python', certifications__is_uploaded_by_nm=True, placement_status=False)"
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the client's pooled connection is reused between calls.
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.server.client_ports.add(self.client_address[1])
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({
+            "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "test-model",
+            "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": ORM},
+            }],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionHandler)
+    server.client_ports = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service = AIService(
+        model_name="test-model", base_url=f"http://127.0.0.1:{server.server_port}/v1"
+    )
+    monkeypatch.setattr(ai_orm, "_AI_SERVICE", service)
+    monkeypatch.setattr(ai_orm, "_ORM_CACHE", type(ai_orm._ORM_CACHE)())
+    monkeypatch.setattr(ai_orm, "_REDIS", None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_shim_can_be_called_repeatedly(provider):
+    assert ai_orm.generate_filters_with_ai_sync("python people") == ORM
+    assert ai_orm.generate_filters_with_ai_sync("python developers") == ORM
+    # Both calls ran on the same loop, so the pooled keep-alive connection was reused.
+    assert len(provider.client_ports) == 1